@@ -1,7 +1,55 @@
 import cv2
 import numpy as np
-from scipy.fftpack import dct, idct
+from scipy.fft import dctn, idctn
+from concurrent.futures import ThreadPoolExecutor, wait
+import functools
 import os
+import threading
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+
+def dct_matrix_8():
+    # Orthonormal DCT-II basis, so A @ block @ A.T matches dctn(block, norm='ortho').
+    k = np.arange(8).reshape(-1, 1)
+    n = np.arange(8).reshape(1, -1)
+    basis = np.cos(np.pi * (2 * n + 1) * k / 16) * np.sqrt(2 / 8)
+    basis[0, :] = np.sqrt(1 / 8)
+    return basis.astype(np.float32)
+
+DCT_MATRIX_8 = dct_matrix_8()
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def hide_embed_kernel(y_f32, Q, bits, out):
+        # Embeds bits into the (2, 1) coefficient of the first len(bits) blocks of y_f32, written to out.
+        # Blocks are independent, so they are spread over Numba's thread pool, and only the modified
+        # pixels are clipped to [0, 255] so the caller needs no extra pass over the whole image.
+        blocks_per_row = y_f32.shape[1] // 8
+        # Only the (2, 1) coefficient is read and changed, so both transforms reduce to that basis image:
+        # a projection onto it forward, and adding it scaled by the change on the way back.
+        basis_21 = np.outer(DCT_MATRIX_8[2], DCT_MATRIX_8[1])
+        q21 = Q[2, 1]
+        inv_q21 = np.float32(1.0) / q21
+        out[:, :] = y_f32
+        for b in prange(bits.shape[0]):
+            top = (b // blocks_per_row) * 8
+            left = (b % blocks_per_row) * 8
+            coef = np.float32(0.0)
+            for i in range(8):
+                for j in range(8):
+                    coef += (y_f32[top + i, left + j] - 128) * basis_21[i, j]
+            quantized = np.int32(np.round(coef * inv_q21))
+            quantized = (quantized & ~1) | bits[b]
+            delta = quantized * q21 - coef
+            for i in range(8):
+                for j in range(8):
+                    out[top + i, left + j] = min(max(out[top + i, left + j] + delta * basis_21[i, j], 0.0), 255.0)
+else:
+    hide_embed_kernel = None
 
 class DCTSteganography:
     def __init__(self):
@@ -10,71 +58,144 @@ class DCTSteganography:
             [14, 13, 16, 24, 40, 57, 69, 56], [14, 17, 22, 29, 51, 87, 80, 62],
             [18, 22, 37, 56, 68, 109, 103, 77], [24, 35, 55, 64, 81, 104, 113, 92],
             [49, 64, 78, 87, 103, 121, 120, 101], [72, 92, 95, 98, 112, 100, 103, 99]
-        ])
+        ], dtype=np.float32)
+        # The payload lives only in the (2, 1) coefficient, so its quantizer step is all the hot paths need.
+        self.q21 = int(self.quantization_table[2, 1])
+        self.inv_q21 = np.float32(1.0) / self.quantization_table[2, 1]
         self.LENGTH_HEADER_BITS = 32
+        # Per-instance cache so repeated encodes into the same cover skip the read, pad and colour conversion.
+        self._load_cover = functools.lru_cache(maxsize=4)(self._read_cover)
+        # PNG compression dominates encode time, so stego images are written on a background thread.
+        self._writer = ThreadPoolExecutor(max_workers=1)
+        self._pending_writes = {}
+        self._write_errors = []
+        self._write_lock = threading.Lock()
 
     def _message_to_binary(self, message):
-        message_bytes = message.encode('utf-8')
-        return ''.join(format(byte, '08b') for byte in message_bytes)
+        message_bytes = np.frombuffer(message.encode('utf-8'), dtype=np.uint8)
+        return np.unpackbits(message_bytes)
 
     def _binary_to_message(self, binary_message):
-        byte_values = []
-        for i in range(0, len(binary_message), 8):
-            byte_segment = binary_message[i:i+8]
-            if len(byte_segment) < 8: break
-            byte_values.append(int(byte_segment, 2))
-        
-        message_bytes = bytes(byte_values)
+        # Drop any trailing partial byte, as the string version did.
+        usable_bits = len(binary_message) - len(binary_message) % 8
+        message_bytes = np.packbits(binary_message[:usable_bits]).tobytes()
         try:
             return message_bytes.decode('utf-8', errors='ignore')
         except Exception:
             return None
 
-    def _apply_dct(self, image_channel):
+    def _apply_dct(self, image_channel, num_blocks=None):
+        # Returns the coefficients as one C-contiguous (num_blocks, 8, 8) float32 array in row-major block order,
+        # so a single coefficient across all blocks (e.g. dct_blocks[:, 2, 1]) is one strided vector.
         h, w = image_channel.shape
-        dct_blocks = []
-        for i in range(0, h, 8):
-            for j in range(0, w, 8):
-                block = image_channel[i:i+8, j:j+8].astype(np.float32) - 128
-                dct_blocks.append(dct(dct(block.T, norm='ortho').T, norm='ortho'))
+        blocks_per_row = w // 8
+        if num_blocks is None: num_blocks = (h // 8) * blocks_per_row
+        # Only the block rows that hold the first num_blocks blocks are cut out and transformed.
+        block_rows = -(-num_blocks // blocks_per_row)
+        # Single precision is plenty for 8-bit samples and halves the memory traffic of the batched transform.
+        region = image_channel[:block_rows * 8].astype(np.float32) - np.float32(128)
+        # View the region as a (rows, cols, 8, 8) grid of blocks so it is transformed in one call. cv2.dct is
+        # orthonormal too but only takes one 2D array, and a per-block loop over it is ~3x slower than this.
+        blocks = region.reshape(block_rows, 8, blocks_per_row, 8).swapaxes(1, 2).reshape(-1, 8, 8)[:num_blocks]
+        dct_blocks = dctn(blocks, type=2, norm='ortho', axes=(-2, -1), workers=-1)
         return dct_blocks, h, w
 
-    def _apply_idct(self, dct_blocks, h, w):
-        reconstructed_image = np.zeros((h, w))
-        block_index = 0
-        for i in range(0, h, 8):
-            for j in range(0, w, 8):
-                reconstructed_block = idct(idct(dct_blocks[block_index].T, norm='ortho').T, norm='ortho')
-                reconstructed_image[i:i+8, j:j+8] = reconstructed_block
-                block_index += 1
-        return reconstructed_image + 128
+    def _apply_idct(self, dct_blocks, image_channel):
+        # Writes the inverse transform of dct_blocks over the leading blocks of image_channel, in place.
+        h, w = image_channel.shape
+        blocks_per_row = w // 8
+        reconstructed_blocks = idctn(dct_blocks, type=2, norm='ortho', axes=(-2, -1), workers=-1) + np.float32(128)
+        reconstructed_blocks = np.clip(reconstructed_blocks, 0, 255).astype(image_channel.dtype)
+
+        grid = image_channel.reshape(h // 8, 8, blocks_per_row, 8).swapaxes(1, 2)
+        full_rows, remainder = divmod(len(dct_blocks), blocks_per_row)
+        grid[:full_rows] = reconstructed_blocks[:full_rows * blocks_per_row].reshape(full_rows, blocks_per_row, 8, 8)
+        if remainder: grid[full_rows, :remainder] = reconstructed_blocks[full_rows * blocks_per_row:]
+        return image_channel
 
-    def hide_message(self, image_path, message, output_path):
+    @staticmethod
+    def _read_cover(image_path, mtime_ns):
+        # mtime_ns is only part of the cache key, so an edited cover is read again. Static so the per-instance
+        # lru_cache does not hold a reference back to the instance.
         img = cv2.imread(image_path, cv2.IMREAD_COLOR)
         if img is None: raise FileNotFoundError("Image not found.")
 
         h_orig, w_orig, _ = img.shape
-        padded_img = self._pad_image(img)
+        padded_img = DCTSteganography._pad_image(img)
         
-        ycbcr_img = cv2.cvtColor(padded_img, cv2.COLOR_BGR2YCrCb)
-        y_channel, cr_channel, cb_channel = cv2.split(ycbcr_img)
+        # BGR2GRAY uses the same BT.601 weights as the Y of YCrCb, without producing the chroma planes.
+        y_channel = cv2.cvtColor(padded_img, cv2.COLOR_BGR2GRAY)
+
+        # The arrays are shared between calls, so guard them against in-place edits.
+        padded_img.flags.writeable = False
+        y_channel.flags.writeable = False
+        return padded_img, y_channel, h_orig, w_orig
+
+    def _write_image(self, output_path, img):
+        if not cv2.imwrite(output_path, img, [cv2.IMWRITE_PNG_COMPRESSION, 3]):
+            raise IOError(f"Could not write '{output_path}'.")
+
+    def _finish_write(self, key, future):
+        # Runs on the writer thread, so failures are queued for the caller instead of printed mid-prompt.
+        with self._write_lock:
+            if self._pending_writes.get(key) is future: del self._pending_writes[key]
+            if future.exception() is not None: self._write_errors.append(future.exception())
+
+    def take_write_errors(self):
+        # Returns (and forgets) the errors of background writes that have failed since the last call.
+        with self._write_lock:
+            errors, self._write_errors = self._write_errors, []
+        return errors
+
+    def wait_for_write(self, image_path):
+        # Blocks until a pending background write to image_path (if any) has finished. Failures are
+        # collected by take_write_errors, so they are not raised again here.
+        with self._write_lock: future = self._pending_writes.get(os.path.abspath(image_path))
+        if future is not None: wait([future])
+
+    def flush(self):
+        # Blocks until every queued write has finished. The writer has a single thread that runs each write's
+        # done callback before the next job, so a no-op job behind them also means their failures are recorded.
+        self._writer.submit(lambda: None).result()
+
+    def close(self):
+        # Finishes every queued write and stops the writer thread; afterwards take_write_errors reports all of
+        # their failures.
+        self._writer.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def hide_message(self, image_path, message, output_path):
+        # The stego image is written on a background thread, so output_path may not exist yet when this returns.
+        # Callers that read it with other tools should call .result() on the returned future, flush(), or use the
+        # instance as a context manager; reveal_message and hide_message wait for pending writes themselves.
+        # Catch unsupported output extensions up front; once the write is queued the caller has moved on.
+        if not cv2.haveImageWriter(output_path): raise ValueError(f"No image writer for '{output_path}' (e.g. use .png).")
+        self.wait_for_write(image_path)
+        if not os.path.exists(image_path): raise FileNotFoundError("Image not found.")
+        padded_img, y_channel, h_orig, w_orig = self._load_cover(image_path, os.stat(image_path).st_mtime_ns)
 
         binary_message = self._message_to_binary(message)
         message_bit_length = len(binary_message)
         
-        length_binary = format(message_bit_length, f'0{self.LENGTH_HEADER_BITS}b')
-        full_binary_payload = length_binary + binary_message
+        length_binary = np.unpackbits(np.array([message_bit_length], dtype='>u4').view(np.uint8))
+        full_binary_payload = np.concatenate([length_binary, binary_message])
         
-        dct_blocks, h, w = self._apply_dct(y_channel)
+        h, w = y_channel.shape
+        num_blocks = (h // 8) * (w // 8)
         
         # Warning Message Test
-        if len(full_binary_payload) > len(dct_blocks):
+        if len(full_binary_payload) > num_blocks:
                     # Calculate the ACTUAL size of the message in bytes using UTF-8, It was Being wronly estimated.
                     message_byte_count = len(message.encode('utf-8'))
 
 
                     #Calculate the image's true capacity in bytes.
-                    image_capacity_bytes = (len(dct_blocks) - self.LENGTH_HEADER_BITS) // 8
+                    image_capacity_bytes = (num_blocks - self.LENGTH_HEADER_BITS) // 8
                     error_message = (
                         f"Message is too large for this image.\n\n"
                         f"  Image Capacity:      {image_capacity_bytes} bytes\n"
@@ -84,61 +205,80 @@ class DCTSteganography:
                     )
                     raise ValueError(error_message)
         
-        payload_index = 0
-        for i in range(len(full_binary_payload)):
-            quantized_block = np.round(dct_blocks[i] / self.quantization_table).astype(np.int32)
-            if int(full_binary_payload[payload_index]) == 0:
-                quantized_block[2, 1] &= ~1
-            else:
-                quantized_block[2, 1] |= 1
-            payload_index += 1
-            dct_blocks[i] = quantized_block * self.quantization_table
-        
-        reconstructed_y = self._apply_idct(dct_blocks, h, w)
-        reconstructed_y = np.clip(reconstructed_y, 0, 255).astype(np.uint8)
+        n = len(full_binary_payload)
+        # Only the block rows holding the first n blocks can change, so every working buffer covers just those.
+        region_rows = -(-n // (w // 8)) * 8
+        y_region = y_channel[:region_rows]
+        if hide_embed_kernel is not None:
+            reconstructed_y = np.empty(y_region.shape, dtype=np.float32)
+            hide_embed_kernel(y_region.astype(np.float32), self.quantization_table,
+                              full_binary_payload, reconstructed_y)
+            reconstructed_y = reconstructed_y.astype(np.uint8)
+        else:
+            # Blocks past the payload are never modified, so only the first n are transformed and written back.
+            dct_blocks, _, _ = self._apply_dct(y_region, n)
+
+            # Only the (2, 1) coefficient carries the payload, so quantize and embed that lane for every block at once.
+            quantized = np.round(dct_blocks[:, 2, 1] * self.inv_q21).astype(np.int32)
+            quantized = (quantized & ~1) | full_binary_payload
+            dct_blocks[:, 2, 1] = quantized * self.q21
+
+            reconstructed_y = self._apply_idct(dct_blocks, y_region.copy())
         
-        stego_img_ycbcr = cv2.merge([reconstructed_y, cr_channel, cb_channel])
-        stego_img_bgr = cv2.cvtColor(stego_img_ycbcr, cv2.COLOR_YCrCb2BGR)
+        # Y has equal weight in R, G and B, so adding the luma change to every channel leaves Cr/Cb untouched
+        # and avoids a lossy YCrCb -> BGR conversion of the whole image.
+        y_delta = reconstructed_y.astype(np.int16) - y_region.astype(np.int16)
+        stego_img_bgr = padded_img.copy()
+        stego_img_bgr[:region_rows] = cv2.add(padded_img[:region_rows], cv2.merge([y_delta, y_delta, y_delta]),
+                                              dtype=cv2.CV_8U)
         stego_img_bgr = stego_img_bgr[:h_orig, :w_orig, :]
         
-        cv2.imwrite(output_path, stego_img_bgr, [cv2.IMWRITE_PNG_COMPRESSION, 3])
-        print(f"\nSUCCESS: Message successfully hidden in '{output_path}'")
+        self.wait_for_write(output_path)
+        key = os.path.abspath(output_path)
+        # Registered under the lock so _finish_write cannot run before the entry exists and leave it behind.
+        with self._write_lock:
+            future = self._writer.submit(self._write_image, output_path, stego_img_bgr)
+            self._pending_writes[key] = future
+        future.add_done_callback(functools.partial(self._finish_write, key))
+        print(f"\nSUCCESS: Message hidden, writing '{output_path}' in the background.")
+        return future
 
     def reveal_message(self, image_path):
+        self.wait_for_write(image_path)
+        if not os.path.exists(image_path): raise FileNotFoundError("Stego image not found.")
         stego_img = cv2.imread(image_path, cv2.IMREAD_COLOR)
         if stego_img is None: raise FileNotFoundError("Stego image not found.")
 
-        padded_img = self._pad_image(stego_img)
-        ycbcr_img = cv2.cvtColor(padded_img, cv2.COLOR_BGR2YCrCb)
-        y_channel, _, _ = cv2.split(ycbcr_img)
+        # Only luma carries the payload, so convert straight to it and pad the single plane.
+        y_channel = self._pad_image(cv2.cvtColor(stego_img, cv2.COLOR_BGR2GRAY))
 
-        dct_blocks, _, _ = self._apply_dct(y_channel)
+        h, w = y_channel.shape
+        num_blocks = (h // 8) * (w // 8)
         
-        if len(dct_blocks) < self.LENGTH_HEADER_BITS: return None
+        if num_blocks < self.LENGTH_HEADER_BITS: return None
 
-        length_binary = ""
-        for i in range(self.LENGTH_HEADER_BITS):
-            quantized_block = np.round(dct_blocks[i] / self.quantization_table).astype(np.int32)
-            length_binary += str(quantized_block[2, 1] & 1)
-        
-        try: message_length = int(length_binary, 2)
-        except ValueError: return None
+        # Transform just the header blocks first; the rest of the image is only touched as far as the payload reaches.
+        header_blocks, _, _ = self._apply_dct(y_channel, self.LENGTH_HEADER_BITS)
+        header_bits = (np.round(header_blocks[:, 2, 1] * self.inv_q21).astype(np.int32) & 1).astype(np.uint8)
+
+        message_length = int(np.packbits(header_bits).view('>u4')[0])
         
-        if message_length > len(dct_blocks) - self.LENGTH_HEADER_BITS: return None
+        if message_length > num_blocks - self.LENGTH_HEADER_BITS: return None
 
-        binary_message = ""
-        for i in range(message_length):
-            block_index = self.LENGTH_HEADER_BITS + i
-            quantized_block = np.round(dct_blocks[block_index] / self.quantization_table).astype(np.int32)
-            binary_message += str(quantized_block[2, 1] & 1)
+        # Re-transforming the 32 header blocks is cheaper than slicing the payload out separately.
+        dct_blocks, _, _ = self._apply_dct(y_channel, self.LENGTH_HEADER_BITS + message_length)
+        lsb_bits = (np.round(dct_blocks[:, 2, 1] * self.inv_q21).astype(np.int32) & 1).astype(np.uint8)
+        binary_message = lsb_bits[self.LENGTH_HEADER_BITS:]
 
         return self._binary_to_message(binary_message)
 
-    def _pad_image(self, img):
-        h_orig, w_orig, _ = img.shape
+    @staticmethod
+    def _pad_image(img):
+        h_orig, w_orig = img.shape[:2]
         h_pad = (8 - h_orig % 8) % 8
         w_pad = (8 - w_orig % 8) % 8
-        return np.pad(img, ((0, h_pad), (0, w_pad), (0, 0)), mode='constant', constant_values=0)
+        if h_pad == 0 and w_pad == 0: return img
+        return cv2.copyMakeBorder(img, 0, h_pad, 0, w_pad, cv2.BORDER_CONSTANT, value=(0, 0, 0))
 
 # Interactive menu.
 if __name__ == '__main__':
@@ -152,6 +292,7 @@ if __name__ == '__main__':
         MESSAGE_FILE_PATH = MESSAGE_FILENAME
 
     while True:
+        for write_error in steganographer.take_write_errors(): print(f"\nERROR: {write_error}")
         print("\n--- DCT Steganography Menu ---")
         print(f"1. Hide message from '{MESSAGE_FILENAME}' (Encode)")
         print("2. Reveal a message (Decode)")
@@ -161,7 +302,6 @@ if __name__ == '__main__':
         if choice == '1':
             try:
                 cover_path = input("Enter path to the cover image (e.g., cover.png): ")
-                if not os.path.exists(cover_path): print("ERROR: Cover image not found."); continue
                 
                 print(f"Attempting to load message from '{MESSAGE_FILE_PATH}'...")
                 if not os.path.exists(MESSAGE_FILE_PATH): print(f"ERROR: Message file '{MESSAGE_FILENAME}' not found."); continue
@@ -177,7 +317,6 @@ if __name__ == '__main__':
         elif choice == '2':
             try:
                 stego_path = input("Enter path to the stego-image (e.g., stego.png): ")
-                if not os.path.exists(stego_path): print("ERROR: Stego-image not found."); continue
                 revealed_message = steganographer.reveal_message(stego_path)
                 if revealed_message is not None:
                     print("\n---------------------------------")
@@ -191,6 +330,8 @@ if __name__ == '__main__':
             except Exception as e: print(f"\nAn unexpected error occurred: {e}")
             
         elif choice == '3':
+            steganographer.close()
+            for write_error in steganographer.take_write_errors(): print(f"\nERROR: {write_error}")
             print("Exiting program. Goodbye!"); break
         else:
             print("Invalid choice. Please enter 1, 2, or 3.")
\ No newline at end of file